@@ -1,265 +1,693 @@
-import subprocess
 import tempfile
 import sys
 import os
+import shutil
 import signal
 import asyncio
-from typing import Dict, Any
-import resource
+import collections
+import functools
+import hashlib
+import json
+from typing import Dict, Any, List, Tuple
 import threading
 import time
+import uuid
 import http.server
 import socketserver
 from pathlib import Path
 
+# Driver run by each warm Python worker. It acts as a fork server: it reads
+# length-prefixed JSON requests ({"code", "timeout"}) from stdin, runs each
+# script in a freshly forked child so no state survives between scripts,
+# and writes back a length-prefixed JSON result frame on a private copy of
+# stdout. The child only ever sees its own result pipe.
+PY_WORKER_DRIVER = """
+# Memory limit first, so it covers the driver's imports and every script
+# child forked from here
+import resource, sys
+memory_limit = int(sys.argv[2]) * 1024 * 1024
+resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+import builtins, contextlib, io, json, os, select, signal, time, traceback
+
+# Captured output beyond this many characters per stream is dropped
+max_output = int(sys.argv[1])
+
+class _OutputLimitExceeded(BaseException):
+    # Raised out of write() to stop a script once its output is capped
+    pass
+
+class CappedBuffer(io.StringIO):
+    truncated = False
+
+    def write(self, s):
+        room = max_output - self.tell()
+        if len(s) > room:
+            self.truncated = True
+            super().write(s[:max(room, 0)])
+            raise _OutputLimitExceeded()
+        super().write(s)
+        return len(s)
+
+# Keep the real stdout for result frames; stray fd-level writes go nowhere
+requests = sys.stdin.buffer
+results = os.fdopen(os.dup(1), "wb")
+os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+
+# Block dangerous imports
+blocked_modules = {'subprocess', 'os', 'shutil', 'socket', 'urllib', 'requests', 'pickle'}
+original_import = builtins.__import__
+
+def safe_import(name, *args, **kwargs):
+    if name in blocked_modules:
+        raise ImportError(f"Import of '{name}' is blocked for security")
+    return original_import(name, *args, **kwargs)
+
+# Driver frames hidden from the tracebacks scripts see
+driver_frames = {("<string>", "run_script"), ("<string>", "safe_import")}
+
+def print_script_traceback():
+    # Like traceback.print_exc(), minus the driver's own frames
+    exc = traceback.TracebackException(*sys.exc_info())
+    pending, seen = [exc], set()
+    while pending:
+        te = pending.pop()
+        if te is None or id(te) in seen:
+            continue
+        seen.add(id(te))
+        te.stack = traceback.StackSummary.from_list(
+            [frame for frame in te.stack if (frame.filename, frame.name) not in driver_frames]
+        )
+        pending += [te.__cause__, te.__context__]
+    sys.stderr.write("".join(exc.format()))
+
+def run_script(code, result_fd):
+    # Runs in the forked child and never returns to the request loop
+    try:
+        # Cut the child off from the request and result pipes
+        results.close()
+        os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+        sys.stdin = io.StringIO()
+
+        builtins.__import__ = safe_import
+        stdout, stderr = CappedBuffer(), CappedBuffer()
+        returncode = 0
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                try:
+                    exec(compile(code, "<stdin>", "exec"), {"__name__": "__main__", "__builtins__": builtins})
+                except SystemExit as e:
+                    if e.code is None or isinstance(e.code, int):
+                        returncode = int(e.code or 0)
+                    else:
+                        returncode = 1
+                        print(e.code, file=sys.stderr)
+                except _OutputLimitExceeded:
+                    returncode = 1
+                except BaseException:
+                    returncode = 1
+                    print_script_traceback()
+            except _OutputLimitExceeded:
+                # Reporting the error overflowed stderr; keep what fit
+                returncode = 1
+
+        output = [buf.getvalue() + ("\\n[output truncated]" if buf.truncated else "") for buf in (stdout, stderr)]
+        payload = memoryview(json.dumps({"returncode": returncode, "stdout": output[0], "stderr": output[1]}).encode())
+        while payload:
+            payload = payload[os.write(result_fd, payload):]
+    finally:
+        os._exit(0)
+
+def collect(pid, read_fd, timeout):
+    # Read the child's result, killing it if it runs past the timeout
+    deadline = time.monotonic() + timeout
+    chunks = []
+    timed_out = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+            timed_out = True
+            os.kill(pid, signal.SIGKILL)
+            break
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    status = os.waitpid(pid, 0)[1]
+
+    if timed_out:
+        return {"timed_out": True}
+    try:
+        return json.loads(b"".join(chunks))
+    except ValueError:
+        return {
+            "returncode": os.waitstatus_to_exitcode(status) or 1,
+            "stdout": "",
+            "stderr": "Script exited without reporting a result\\n"
+        }
+
+while True:
+    header = requests.read(4)
+    if len(header) < 4:
+        break
+    request = json.loads(requests.read(int.from_bytes(header, "big")))
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        run_script(request["code"], write_fd)
+    os.close(write_fd)
+
+    frame = json.dumps(collect(pid, read_fd, request["timeout"])).encode()
+    results.write(len(frame).to_bytes(4, "big") + frame)
+    results.flush()
+"""
+
+# Safety wrapper prepended to every JavaScript script. The timeout is
+# enforced by the parent killing the process, not by a timer in the script.
+JS_PREAMBLE = b"""
+// Block dangerous modules
+const originalRequire = require;
+const blockedModules = ['fs', 'child_process', 'net', 'http', 'https', 'crypto'];
+
+require = function(module) {
+    if (blockedModules.includes(module)) {
+        throw new Error(`Module '${module}' is blocked for security`);
+    }
+    return originalRequire(module);
+};
+
+// User code starts here
+"""
+
+# Tool catalogue returned by tools/list; built once since it never changes
+TOOLS = {
+    "tools": [
+        {
+            "name": "execute_python",
+            "description": "Execute Python code and return output",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "code": {"type": "string"},
+                    "timeout": {"type": "integer", "optional": True, "default": 30},
+                    # Opt-in: reuse the result of an identical recent call
+                    "cache": {"type": "boolean", "optional": True, "default": False}
+                },
+                "required": ["code"]
+            }
+        },
+        {
+            "name": "execute_javascript",
+            "description": "Execute JavaScript code with Node.js",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "code": {"type": "string"},
+                    "timeout": {"type": "integer", "optional": True, "default": 30},
+                    # Opt-in: reuse the result of an identical recent call
+                    "cache": {"type": "boolean", "optional": True, "default": False}
+                },
+                "required": ["code"]
+            }
+        },
+        {
+            "name": "serve_html",
+            "description": "Serve HTML content on local server",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "html": {"type": "string"},
+                    "port": {"type": "integer", "optional": True, "default": 8080}
+                },
+                "required": ["html"]
+            }
+        }
+    ]
+}
+
+# Tool list advertised when pages are served by the host app: serve_html
+# takes no port there, since no standalone server is started
+MOUNTED_TOOLS = {
+    "tools": [
+        tool if tool["name"] != "serve_html" else {
+            "name": "serve_html",
+            "description": "Serve HTML content through the host app",
+            "inputSchema": {
+                "type": "object",
+                "properties": {"html": {"type": "string"}},
+                "required": ["html"]
+            }
+        }
+        for tool in TOOLS["tools"]
+    ]
+}
+
+# Shared root for serve_html pages; a fixed path so every process on the
+# host (e.g. several uvicorn workers) serves the same pages
+SERVE_DIR = Path(tempfile.gettempdir()) / "json_mcp_served"
+# Each server instance keeps at most this many of the pages it wrote
+MAX_SERVED_PAGES = 32
+
+def prune_served_pages(serve_dir: Path = SERVE_DIR, max_pages: int = MAX_SERVED_PAGES):
+    """Delete the oldest pages in serve_dir beyond max_pages.
+
+    Meant to run once before any server instance starts (e.g. in the parent
+    process ahead of the uvicorn workers), since running instances only
+    remove pages they wrote themselves. Entries that vanish mid-scan are skipped.
+    """
+    pages = []
+    try:
+        with os.scandir(serve_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pages.append((entry.stat(follow_symlinks=False).st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+    except FileNotFoundError:
+        return
+    pages.sort()
+    for _, path in pages[:max(len(pages) - max_pages, 0)]:
+        shutil.rmtree(path, True)
+
+class PythonWorkerPool:
+    """Pool of warm Python fork servers that run each script in a fresh child"""
+    
+    def __init__(self, size: int, max_memory_mb: int, max_output_bytes: int, max_requests: int = 100):
+        self.max_memory_mb = max_memory_mb
+        self.max_output_bytes = max_output_bytes
+        self.max_requests = max_requests
+        # Idle slots hold (process, uses) or None until a worker is spawned
+        self._idle: asyncio.Queue = asyncio.Queue()
+        # Every live worker, idle or checked out, so close() can reach them all
+        self._procs = set()
+        for _ in range(size):
+            self._idle.put_nowait(None)
+    
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        proc = await asyncio.create_subprocess_exec(
+            # -I: ignore PYTHON* env vars and user site-packages; -B: no .pyc writes
+            sys.executable, "-I", "-B", "-c", PY_WORKER_DRIVER,
+            str(self.max_output_bytes), str(self.max_memory_mb),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=tempfile.gettempdir(),
+            # Own process group, so retiring a worker also kills its script child
+            start_new_session=True
+        )
+        self._procs.add(proc)
+        return proc
+    
+    async def _retire(self, proc: asyncio.subprocess.Process):
+        self._procs.discard(proc)
+        if proc.returncode is None:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        await proc.wait()
+    
+    async def _exchange(self, proc: asyncio.subprocess.Process, code: str, timeout: float) -> Dict[str, Any]:
+        request = json.dumps({"code": code, "timeout": timeout}).encode()
+        proc.stdin.write(len(request).to_bytes(4, "big") + request)
+        await proc.stdin.drain()
+        header = await proc.stdout.readexactly(4)
+        return json.loads(await proc.stdout.readexactly(int.from_bytes(header, "big")))
+    
+    async def run(self, code: str, timeout: float) -> Tuple[int, str, str]:
+        """Run code in a fresh child of a warm worker, recycling the worker after errors or max_requests uses"""
+        # The timeout covers waiting for a free worker as well as running
+        deadline = time.monotonic() + timeout
+        worker = await asyncio.wait_for(self._idle.get(), timeout)
+        try:
+            if worker is None or worker[1] >= self.max_requests or worker[0].returncode is not None:
+                if worker is not None:
+                    await self._retire(worker[0])
+                worker = (await self._spawn(), 0)
+            
+            proc, uses = worker
+            try:
+                # The driver enforces the timeout itself; this is a backstop
+                # in case the driver stops responding
+                remaining = max(deadline - time.monotonic(), 0)
+                result = await asyncio.wait_for(self._exchange(proc, code, remaining), remaining + 5)
+            except asyncio.IncompleteReadError:
+                worker = None
+                await self._retire(proc)
+                raise RuntimeError("Python worker exited unexpectedly")
+            except BaseException:
+                worker = None
+                await self._retire(proc)
+                raise
+            
+            worker = (proc, uses + 1)
+            if result.get("timed_out"):
+                raise asyncio.TimeoutError()
+            return result["returncode"], result["stdout"], result["stderr"]
+        finally:
+            self._idle.put_nowait(worker)
+    
+    async def start(self):
+        """Spawn a worker for every empty slot ahead of the first request"""
+        for _ in range(self._idle.qsize()):
+            worker = self._idle.get_nowait()
+            if worker is None:
+                worker = (await self._spawn(), 0)
+            self._idle.put_nowait(worker)
+    
+    async def close(self):
+        """Stop every worker, including ones still running a script"""
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for proc in list(self._procs):
+            await self._retire(proc)
+
+class PageRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Static handler for served pages that never lists directories"""
+
+    def list_directory(self, path):
+        self.send_error(404, "File not found")
+        return None
+
 class CodeExecutionMCPServer:
-    def __init__(self):
+    def __init__(self, serve_base_url: str = None):
         self.max_execution_time = 30
         self.max_memory_mb = 512
+        self.max_output_bytes = 1024 * 1024
+        self.python_workers = 4
+        self.serve_dir = SERVE_DIR
+        self.serve_dir.mkdir(parents=True, exist_ok=True)
+        # When set, pages are served by the host app (e.g. a FastAPI mount
+        # over serve_dir) and no standalone HTTP server is started
+        self.serve_base_url = serve_base_url
+        # Oldest pages are deleted once more than max_served_pages exist
+        self.max_served_pages = MAX_SERVED_PAGES
+        self.served_pages = collections.deque()
         self.running_servers = {}
+        self.python_pool = PythonWorkerPool(self.python_workers, self.max_memory_mb, self.max_output_bytes)
+        
+        # Dispatch tables: RPC method -> handler(params), tool name -> handler(arguments)
+        self.method_handlers = {
+            "tools/list": self._handle_list_tools,
+            "tools/call": self.call_tool,
+        }
+        self.tool_handlers = {
+            "execute_python": self.execute_python,
+            "execute_javascript": self.execute_javascript,
+            "serve_html": self.serve_html,
+        }
+        
+        # Short-lived LRU of tool results keyed by (tool, arguments):
+        # key -> (stored_at, result, size). Only calls passing cache=true use
+        # it, and it is bounded by the total size of the cached output text.
+        self.cacheable_tools = {"execute_python", "execute_javascript"}
+        self.result_cache_max_bytes = 16 * 1024 * 1024
+        self.result_cache_ttl = 10
+        self.result_cache = collections.OrderedDict()
+        self.result_cache_bytes = 0
         
+    @classmethod
+    async def create(cls, **kwargs) -> "CodeExecutionMCPServer":
+        """Build a server with its Python workers already started"""
+        server = cls(**kwargs)
+        await server.python_pool.start()
+        return server
+    
+    async def aclose(self):
+        """Stop the Python workers and any standalone HTML servers"""
+        await self.python_pool.close()
+        for port in list(self.running_servers):
+            await asyncio.to_thread(self.stop_server, port)
+    
     async def handle_mcp_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Main MCP request handler"""
         method = request.get("method")
         params = request.get("params", {})
         
-        if method == "tools/list":
-            return self.list_tools()
-        elif method == "tools/call":
-            return await self.call_tool(params)
-        else:
+        handler = self.method_handlers.get(method)
+        if handler is None:
             return {"error": f"Unknown method: {method}"}
+        return await handler(params)
+    
+    async def handle_mcp_request_batch(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Handle several MCP requests, returning one result per request in order.
+        
+        tools/list is answered once for the whole batch and every other call
+        runs concurrently; a request that raises gets an error dict without
+        failing the rest of the batch.
+        """
+        methods = [request.get("method") for request in requests]
+        params = [request.get("params", {}) for request in requests]
+        results: List[Dict[str, Any]] = [None] * len(requests)
+        
+        pending_indexes = []
+        pending_calls = []
+        tools = None
+        for i, method in enumerate(methods):
+            if method == "tools/list":
+                if tools is None:
+                    tools = self.list_tools()
+                results[i] = tools
+                continue
+            handler = self.method_handlers.get(method)
+            if handler is None:
+                results[i] = {"error": f"Unknown method: {method}"}
+                continue
+            pending_indexes.append(i)
+            pending_calls.append(handler(params[i]))
+        
+        outcomes = await asyncio.gather(*pending_calls, return_exceptions=True)
+        for i, outcome in zip(pending_indexes, outcomes):
+            if isinstance(outcome, BaseException):
+                outcome = {"error": f"Request failed: {str(outcome)}"}
+            results[i] = outcome
+        return results
     
     def list_tools(self) -> Dict[str, Any]:
-        return {
-            "tools": [
-                {
-                    "name": "execute_python",
-                    "description": "Execute Python code and return output",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "code": {"type": "string"},
-                            "timeout": {"type": "integer", "optional": True, "default": 30}
-                        },
-                        "required": ["code"]
-                    }
-                },
-                {
-                    "name": "execute_javascript",
-                    "description": "Execute JavaScript code with Node.js",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "code": {"type": "string"},
-                            "timeout": {"type": "integer", "optional": True, "default": 30}
-                        },
-                        "required": ["code"]
-                    }
-                },
-                {
-                    "name": "serve_html",
-                    "description": "Serve HTML content on local server",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "html": {"type": "string"},
-                            "port": {"type": "integer", "optional": True, "default": 8080}
-                        },
-                        "required": ["html"]
-                    }
-                }
-            ]
-        }
+        return MOUNTED_TOOLS if self.serve_base_url else TOOLS
+    
+    async def _handle_list_tools(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self.list_tools()
     
     async def call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Handle tool calls"""
         tool_name = params.get("name")
         arguments = params.get("arguments", {})
         
+        handler = self.tool_handlers.get(tool_name)
+        if handler is None:
+            return {"error": f"Unknown tool: {tool_name}"}
+        
+        # Side-effecting tools such as serve_html are never cached, and the
+        # rest only when the caller says the code is deterministic
+        key = None
+        if tool_name in self.cacheable_tools and arguments.get("cache") is True:
+            key = hashlib.blake2b(
+                json.dumps([tool_name, arguments], sort_keys=True).encode(), digest_size=16
+            ).hexdigest()
+            cached = self.result_cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.result_cache_ttl:
+                self.result_cache.move_to_end(key)
+                return cached[1]
+        
         try:
-            if tool_name == "execute_python":
-                return await self.execute_python(arguments)
-            elif tool_name == "execute_javascript":
-                return await self.execute_javascript(arguments)
-            elif tool_name == "serve_html":
-                return await self.serve_html(arguments)
-            else:
-                return {"error": f"Unknown tool: {tool_name}"}
+            result = await handler(arguments)
         except Exception as e:
             return {"error": f"Tool execution failed: {str(e)}"}
+        
+        if key is not None and self._is_cacheable(result):
+            self._store_result(key, result)
+        return result
+    
+    def _is_cacheable(self, result: Dict[str, Any]) -> bool:
+        """Only successful runs are cached, so retries of a failed script run again"""
+        if "error" in result:
+            return False
+        return all(item.get("text", "").startswith("Return code: 0\n") for item in result.get("content", []))
+    
+    def _store_result(self, key: str, result: Dict[str, Any]):
+        size = sum(len(item.get("text", "")) for item in result.get("content", []))
+        if size > self.result_cache_max_bytes:
+            return
+        previous = self.result_cache.pop(key, None)
+        if previous is not None:
+            self.result_cache_bytes -= previous[2]
+        self.result_cache[key] = (time.monotonic(), result, size)
+        self.result_cache_bytes += size
+        while self.result_cache_bytes > self.result_cache_max_bytes:
+            self.result_cache_bytes -= self.result_cache.popitem(last=False)[1][2]
+    
+    async def _read_capped(self, stream: asyncio.StreamReader, proc: asyncio.subprocess.Process) -> str:
+        """Read a stream up to max_output_bytes, killing the process if it writes more"""
+        buf = bytearray()
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                return buf.decode(errors="replace")
+            buf.extend(chunk)
+            if len(buf) > self.max_output_bytes:
+                if proc.returncode is None:
+                    proc.kill()
+                return buf[:self.max_output_bytes].decode(errors="replace") + "\n[output truncated]"
+    
+    async def _run_subprocess(self, cmd: List[str], timeout: float, stdin: bytes = None) -> Tuple[int, str, str]:
+        """Run a command without blocking the event loop, killing it on timeout"""
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=tempfile.gettempdir()
+        )
+        
+        async def feed_stdin():
+            if stdin is None:
+                return
+            try:
+                proc.stdin.write(stdin)
+                await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            proc.stdin.close()
+        
+        async def communicate():
+            # Stream both pipes into bounded buffers while stdin is fed
+            stdout, stderr, _ = await asyncio.gather(
+                self._read_capped(proc.stdout, proc),
+                self._read_capped(proc.stderr, proc),
+                feed_stdin()
+            )
+            await proc.wait()
+            return stdout, stderr
+        
+        try:
+            stdout, stderr = await asyncio.wait_for(communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise
+        
+        return proc.returncode, stdout, stderr
     
     async def execute_python(self, args: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute Python code in subprocess"""
+        """Execute Python code on a warm worker interpreter"""
         code = args["code"]
         timeout = args.get("timeout", self.max_execution_time)
         
-        # Add memory and import restrictions for safety
-        safe_code = f"""
-import resource
-import sys
-
-# Set memory limit
-resource.setrlimit(resource.RLIMIT_AS, ({self.max_memory_mb * 1024 * 1024}, {self.max_memory_mb * 1024 * 1024}))
-
-# Block dangerous imports
-blocked_modules = {{'subprocess', 'os', 'shutil', 'socket', 'urllib', 'requests', 'pickle'}}
-original_import = __builtins__.__import__
-
-def safe_import(name, *args, **kwargs):
-    if name in blocked_modules:
-        raise ImportError(f"Import of '{{name}}' is blocked for security")
-    return original_import(name, *args, **kwargs)
-
-__builtins__.__import__ = safe_import
-
-# User code starts here
-{code}
-"""
-        
-        # Write to temp script
-        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
-            f.write(safe_code)
-            script_path = f.name
-        
         try:
-            # Run it with timeout and resource limits
-            proc = subprocess.run(
-                [sys.executable, script_path],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=tempfile.gettempdir()
-            )
+            # Memory limits are set at worker spawn, import restrictions by the driver
+            returncode, stdout, stderr = await self.python_pool.run(code, timeout)
             
             return {
                 "content": [
                     {
                         "type": "text",
-                        "text": f"Return code: {proc.returncode}\n\nSTDOUT:\n{proc.stdout}\n\nSTDERR:\n{proc.stderr}"
+                        "text": f"Return code: {returncode}\n\nSTDOUT:\n{stdout}\n\nSTDERR:\n{stderr}"
                     }
                 ]
             }
             
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             return {"error": f"Python execution timed out after {timeout} seconds"}
         except Exception as e:
             return {"error": f"Python execution failed: {str(e)}"}
-        finally:
-            # Clean up temp file
-            if os.path.exists(script_path):
-                os.unlink(script_path)
     
     async def execute_javascript(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Execute JavaScript code with Node.js"""
         code = args["code"]
         timeout = args.get("timeout", self.max_execution_time)
         
-        # Add basic safety wrapper
-        safe_code = f"""
-// Set timeout for execution
-setTimeout(() => {{
-    console.error('Script timed out');
-    process.exit(1);
-}}, {timeout * 1000});
-
-// Block dangerous modules
-const originalRequire = require;
-const blockedModules = ['fs', 'child_process', 'net', 'http', 'https', 'crypto'];
-
-require = function(module) {{
-    if (blockedModules.includes(module)) {{
-        throw new Error(`Module '${{module}}' is blocked for security`);
-    }}
-    return originalRequire(module);
-}};
-
-// User code starts here
-{code}
-"""
-        
-        # Write to temp script
-        with tempfile.NamedTemporaryFile("w", suffix=".js", delete=False) as f:
-            f.write(safe_code)
-            script_path = f.name
-        
         try:
             # Check if Node.js is available
-            node_check = subprocess.run(
-                ["node", "--version"],
-                capture_output=True,
-                timeout=5
-            )
+            node_check, _, _ = await self._run_subprocess(["node", "--version"], 5)
             
-            if node_check.returncode != 0:
+            if node_check != 0:
                 return {"error": "Node.js not found. Please install Node.js to execute JavaScript."}
             
-            # Run JavaScript with Node.js
-            proc = subprocess.run(
-                ["node", script_path],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=tempfile.gettempdir()
+            # Run JavaScript with Node.js, feeding the script over stdin
+            returncode, stdout, stderr = await self._run_subprocess(
+                ["node", "-"], timeout, JS_PREAMBLE + code.encode()
             )
             
             return {
                 "content": [
                     {
                         "type": "text",
-                        "text": f"Return code: {proc.returncode}\n\nSTDOUT:\n{proc.stdout}\n\nSTDERR:\n{proc.stderr}"
+                        "text": f"Return code: {returncode}\n\nSTDOUT:\n{stdout}\n\nSTDERR:\n{stderr}"
                     }
                 ]
             }
             
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             return {"error": f"JavaScript execution timed out after {timeout} seconds"}
         except Exception as e:
             return {"error": f"JavaScript execution failed: {str(e)}"}
-        finally:
-            # Clean up temp file
-            if os.path.exists(script_path):
-                os.unlink(script_path)
+    
+    def _write_page(self, page_dir: Path, html_content: str):
+        page_dir.mkdir(parents=True)
+        (page_dir / "index.html").write_text(html_content)
     
     async def serve_html(self, args: Dict[str, Any]) -> Dict[str, Any]:
-        """Serve HTML content on local server"""
+        """Serve HTML content from the host app or the shared server on the requested port"""
         html_content = args["html"]
         port = args.get("port", 8080)
+        if self.serve_base_url and "port" in args:
+            return {"error": "The port argument is not supported; pages are served by the host app"}
         
-        # Create temp directory for serving
-        temp_dir = tempfile.mkdtemp()
-        html_path = os.path.join(temp_dir, "index.html")
+        # Each page gets its own directory under the shared serve root
+        slug = uuid.uuid4().hex[:8]
+        page_dir = self.serve_dir / slug
         
         try:
-            # Write HTML to file
-            with open(html_path, "w") as f:
-                f.write(html_content)
+            # Write HTML to file off the event loop
+            await asyncio.to_thread(self._write_page, page_dir, html_content)
             
-            # Start HTTP server in background thread
-            def start_server():
-                os.chdir(temp_dir)
-                handler = http.server.SimpleHTTPRequestHandler
-                
-                # Try to bind to the port
-                try:
-                    with socketserver.TCPServer(("", port), handler) as httpd:
-                        self.running_servers[port] = httpd
-                        httpd.serve_forever()
-                except OSError as e:
-                    print(f"Port {port} already in use: {e}")
+            self.served_pages.append(page_dir)
+            if len(self.served_pages) > self.max_served_pages:
+                await asyncio.to_thread(shutil.rmtree, self.served_pages.popleft(), True)
             
-            # Start server in background
-            server_thread = threading.Thread(target=start_server, daemon=True)
-            server_thread.start()
+            if self.serve_base_url:
+                url = f"{self.serve_base_url}/{slug}/"
+            else:
+                url = f"http://localhost:{port}/{slug}/"
             
-            # Give server time to start
-            await asyncio.sleep(1)
+            if not self.serve_base_url and port not in self.running_servers:
+                # Start HTTP server in background thread
+                ready = threading.Event()
+                bind_errors = []
+                
+                def start_server():
+                    handler = functools.partial(PageRequestHandler, directory=str(self.serve_dir))
+                    
+                    # Try to bind to the port
+                    try:
+                        with socketserver.TCPServer(("", port), handler) as httpd:
+                            self.running_servers[port] = httpd
+                            ready.set()
+                            httpd.serve_forever()
+                    except OSError as e:
+                        bind_errors.append(e)
+                        ready.set()
+                
+                # Start server in background
+                server_thread = threading.Thread(target=start_server, daemon=True)
+                server_thread.start()
+                
+                # Wait until the socket is bound rather than a fixed delay
+                if not await asyncio.to_thread(ready.wait, 5):
+                    return {"error": f"HTML server on port {port} did not start in time"}
+                if bind_errors:
+                    return {"error": f"Port {port} already in use: {bind_errors[0]}"}
             
             return {
                 "content": [
                     {
                         "type": "text",
-                        "text": f"HTML server started!\nAccess your page at: http://localhost:{port}\nServing from: {temp_dir}"
+                        "text": f"HTML server started!\nAccess your page at: {url}\nServing from: {page_dir}"
                     }
                 ]
             }
@@ -277,7 +705,7 @@ require = function(module) {{
 
 # Usage example and test
 async def main():
-    server = SimpleExecutionMCPServer()
+    server = await CodeExecutionMCPServer.create()
     
     # Test Python execution
     print("Testing Python execution...")
@@ -368,6 +796,8 @@ console.log("Sum of squares:", squared.reduce((a, b) => a + b, 0));
     
     response = await server.handle_mcp_request(html_request)
     print("HTML server result:", response)
+    
+    await server.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,14 +1,23 @@
 # main.py
 
 import asyncio
-from typing import Any, Dict, List
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Tuple, Union
 
-from fastapi import FastAPI
-from pydantic import BaseModel
+import msgspec
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import NotRequired, TypedDict
 
-from code_execution import CodeExecutionMCPServer
+from code_execution import SERVE_DIR, CodeExecutionMCPServer, prune_served_pages
 
-# 1) Define your Pydantic models up front
+# 1) Request types, docs-only response models and shared response values
 
 class ArtifactModel(BaseModel):
     id: str
@@ -18,42 +27,280 @@ class ArtifactModel(BaseModel):
 class ExecuteResponse(BaseModel):
     status: str                  # "success" or "error"
     outputs: Dict[str, Any]      # raw handler payload, e.g. {"tools": [...]}
-    artifacts: List[ArtifactModel]
+    artifacts: Tuple[ArtifactModel, ...] = ()
 
-class RPCRequest(BaseModel):
+class RPCRequest(TypedDict):
     method: str
-    params: Dict[str, Any] = {}
+    params: NotRequired[Dict[str, Any]]
 
-# 2) Instantiate FastAPI and your server
+# Compiled once; msgspec decodes and type-checks the raw body straight into
+# plain dicts (no coercion, unknown keys dropped). A JSON array body is a
+# JSON-RPC 2.0 style batch of requests.
+RPC_BODY_DECODER = msgspec.json.Decoder(Union[RPCRequest, List[RPCRequest]])
+
+# Only used to document the request body in OpenAPI
+RPC_REQUEST_SCHEMA = TypeAdapter(RPCRequest).json_schema()
+
+# Shared "no artifacts" value; a tuple so it is safe to reuse across responses
+NO_ARTIFACTS = ()
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson instead of the stdlib json module"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+class SandboxedStaticFiles(StaticFiles):
+    """Static files served with an opaque origin, so served pages can't call /run"""
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        response.headers["Content-Security-Policy"] = "sandbox allow-scripts"
+        return response
+
+# 2) Instantiate FastAPI; the server is created per worker in lifespan()
+
+# Address the entry point binds to; loopback unless explicitly exposed
+HOST = os.environ.get("HOST", "127.0.0.1")
+PORT = int(os.environ.get("PORT", "8000"))
+
+# Base URL clients use to reach this app; serve_html pages live under /served.
+# Defaults to HOST:PORT, with wildcard binds reached through localhost and
+# IPv6 literals bracketed.
+PUBLIC_HOST = "localhost" if HOST in ("0.0.0.0", "::") else f"[{HOST}]" if ":" in HOST else HOST
+PUBLIC_URL = os.environ.get("PUBLIC_URL", f"http://{PUBLIC_HOST}:{PORT}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the server (and warm its Python workers) on the serving event loop
+    app.state.server = await CodeExecutionMCPServer.create(serve_base_url=f"{PUBLIC_URL}/served")
+    app.state.current_batch = []
+    app.state.batch_cond = asyncio.Condition()
+    app.state.batch_tasks = set()
+    app.state.batch_executor = asyncio.create_task(batch_executor(app.state))
+    yield
+    # Stop taking batches, then cancel in-flight ones before the workers go
+    tasks = [app.state.batch_executor, *app.state.batch_tasks]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await app.state.server.aclose()
 
 app = FastAPI(
     openapi_url="/openapi.json",
     docs_url="/docs",
-    redoc_url=None
+    redoc_url=None,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
-server = CodeExecutionMCPServer()
+# The directory is created by the server at startup. Pages hold caller
+# supplied HTML on the same host as /run, hence the sandbox.
+app.mount("/served", SandboxedStaticFiles(directory=SERVE_DIR, html=True, check_dir=False), name="served")
 
-# 3) Your JSON‑RPC endpoint with response_model
+# 3) Micro-batching without a timer: /run calls fold into the current batch
+#    until the batch executor takes it. Batch state lives on app.state and is
+#    created in lifespan(), so it is bound to the serving event loop.
+#    - "concurrent" (default): each batch is dispatched in its own task as
+#      soon as it is taken, so a slow tool never delays the batches behind it
+#    - "sequential": the executor awaits each batch, so calls arriving while
+#      it runs form the next batch (execution time is the batching window)
 
-@app.post("/run", response_model=ExecuteResponse)
-async def run_rpc(req: RPCRequest):
-    raw = await server.handle_mcp_request(req.dict())
-    return ExecuteResponse(
-        status="success",
-        outputs=raw,
-        artifacts=[]
+PIPELINING_MODES = ("concurrent", "sequential")
+PIPELINING_MODE = os.environ.get("RPC_PIPELINING_MODE", "concurrent")
+if PIPELINING_MODE not in PIPELINING_MODES:
+    raise ValueError(
+        f"Unknown RPC_PIPELINING_MODE {PIPELINING_MODE!r}; expected one of {', '.join(PIPELINING_MODES)}"
     )
+MAX_BATCH_SIZE = int(os.environ.get("RPC_MAX_BATCH_SIZE", "64"))
+
+async def submit_rpc(state, payload: Dict[str, Any]) -> Dict[str, Any]:
+    if state.batch_executor.done():
+        raise HTTPException(status_code=503, detail="Batch executor is not running")
+    future = asyncio.get_running_loop().create_future()
+    async with state.batch_cond:
+        await state.batch_cond.wait_for(lambda: len(state.current_batch) < MAX_BATCH_SIZE)
+        state.current_batch.append((payload, future))
+        state.batch_cond.notify_all()
+    return await future
+
+async def dispatch_batch(server: CodeExecutionMCPServer, batch):
+    payloads = [payload for payload, _ in batch]
+    try:
+        results = await server.handle_mcp_request_batch(payloads)
+    except asyncio.CancelledError:
+        # Shutdown cancelled the batch; release its callers before unwinding
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(HTTPException(status_code=503, detail="Batch cancelled"))
+        raise
+    except Exception as e:
+        results = [{"error": f"Batch dispatch failed: {str(e)}"}] * len(batch)
+    for (_, future), result in zip(batch, results):
+        if not future.done():
+            future.set_result(result)
+
+async def batch_executor(state):
+    try:
+        while True:
+            async with state.batch_cond:
+                await state.batch_cond.wait_for(lambda: state.current_batch)
+                batch = state.current_batch[:]
+                state.current_batch.clear()
+                state.batch_cond.notify_all()
+
+            if PIPELINING_MODE == "sequential":
+                await dispatch_batch(state.server, batch)
+            else:
+                task = asyncio.create_task(dispatch_batch(state.server, batch))
+                state.batch_tasks.add(task)
+                task.add_done_callback(state.batch_tasks.discard)
+    finally:
+        # Don't leave callers waiting on a batch nobody will take
+        for _, future in state.current_batch:
+            if not future.done():
+                future.set_exception(HTTPException(status_code=503, detail="Batch executor stopped"))
+        state.current_batch.clear()
 
-# 4) Healthcheck & misc routes
+# 4) Your JSON‑RPC endpoint, registered as a plain Starlette route so no
+#    dependency solving or response-model handling runs per call. Responses
+#    are {"status", "outputs", "artifacts"} envelopes. A single request goes
+#    through the batcher; an array body is already a batch and is handed to
+#    the server directly (at most MAX_BATCH_SIZE requests), answered with
+#    one envelope per request. Plain routes are left out of the generated
+#    OpenAPI document, so openapi() below adds /run to it by hand.
+
+async def run_rpc(request: Request):
+    # Only JSON bodies (application/json or application/*+json) are accepted;
+    # this also keeps simple cross-site form posts (text/plain etc.) from
+    # ever reaching the tools
+    media_type = request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    if media_type != "application/json" and not (
+        media_type.startswith("application/") and media_type.endswith("+json")
+    ):
+        raise HTTPException(status_code=415, detail="Content-Type must be application/json")
+
+    try:
+        body = RPC_BODY_DECODER.decode(await request.body())
+    except msgspec.MsgspecError as e:
+        raise RequestValidationError([
+            {"type": "value_error", "loc": ("body",), "msg": str(e), "input": None}
+        ])
+    
+    if isinstance(body, list):
+        if not body or len(body) > MAX_BATCH_SIZE:
+            raise RequestValidationError([{
+                "type": "value_error",
+                "loc": ("body",),
+                "msg": f"Batch must contain between 1 and {MAX_BATCH_SIZE} requests",
+                "input": None
+            }])
+        results = await request.app.state.server.handle_mcp_request_batch(body)
+        return ORJSONResponse([
+            {"status": "success", "outputs": raw, "artifacts": NO_ARTIFACTS}
+            for raw in results
+        ])
+    
+    raw = await submit_rpc(request.app.state, body)
+    return ORJSONResponse({
+        "status": "success",
+        "outputs": raw,
+        "artifacts": NO_ARTIFACTS
+    })
+
+app.add_route("/run", run_rpc, methods=["POST"])
+
+def openapi() -> Dict[str, Any]:
+    """Generated schema plus /run, which as a plain route is not picked up"""
+    if app.openapi_schema:
+        return app.openapi_schema
+    schema = get_openapi(
+        title=app.title,
+        version=app.version,
+        openapi_version=app.openapi_version,
+        description=app.description,
+        routes=app.routes
+    )
+    response_schema = ExecuteResponse.model_json_schema(ref_template="#/components/schemas/{model}")
+    components = schema.setdefault("components", {}).setdefault("schemas", {})
+    components.update(response_schema.pop("$defs", {}))
+    components["ExecuteResponse"] = response_schema
+    envelope = {"$ref": "#/components/schemas/ExecuteResponse"}
+    schema["paths"]["/run"] = {
+        "post": {
+            "summary": "Run Rpc",
+            "operationId": "run_rpc_run_post",
+            "requestBody": {
+                "required": True,
+                "content": {"application/json": {"schema": {"anyOf": [
+                    RPC_REQUEST_SCHEMA,
+                    {"type": "array", "items": RPC_REQUEST_SCHEMA, "minItems": 1, "maxItems": MAX_BATCH_SIZE}
+                ]}}}
+            },
+            "responses": {
+                "200": {
+                    "description": "One envelope, or one per request for an array body",
+                    "content": {"application/json": {"schema": {"anyOf": [
+                        envelope,
+                        {"type": "array", "items": envelope}
+                    ]}}}
+                },
+                "415": {"description": "Body is not JSON"},
+                "422": {"description": "Validation Error"},
+                "503": {"description": "Batch executor is not running"}
+            }
+        }
+    }
+    app.openapi_schema = schema
+    return schema
+
+app.openapi = openapi
+
+# 5) Healthcheck & misc routes; bodies are serialized once at import
+
+HEALTH_BODY = orjson.dumps({"status": "ok"})
+ROOT_BODY = orjson.dumps({"message": "JSON‑RPC service is running."})
+EMPTY_BODY = b"{}"
 
 @app.get("/healthz")
-def health():
-    return {"status": "ok"}
+async def health():
+    return Response(HEALTH_BODY, media_type="application/json")
+
+@app.head("/healthz")
+async def health_head():
+    return Response(status_code=200)
 
 @app.get("/")
 async def read_root():
-    return {"message": "JSON‑RPC service is running."}
+    return Response(ROOT_BODY, media_type="application/json")
 
 @app.get("/favicon.ico")
 async def favicon():
-    return {}
+    return Response(EMPTY_BODY, media_type="application/json")
+
+# 6) Entry point: C-accelerated HTTP parsing and event loop, one process per
+#    core. Each worker gets its own CodeExecutionMCPServer; pages are shared
+#    through serve_dir, which is a fixed path, so pages left by earlier runs
+#    are pruned once here before the workers start. Connections are kept
+#    alive for RPC clients and the Server/Date headers are not sent (the CLI
+#    equivalent is --no-server-header --no-date-header).
+#    WEB_CONCURRENCY defaults to the CPU count, and every worker pre-spawns
+#    its own Python interpreters (4 per worker, each capped at 512 MB), so
+#    startup launches 4 x cores interpreters; size it for the host's memory.
+
+if __name__ == "__main__":
+    import uvicorn
+
+    prune_served_pages()
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        backlog=4096,
+        timeout_keep_alive=75,
+        limit_concurrency=1000,
+        server_header=False,
+        date_header=False
+    )